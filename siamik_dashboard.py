@@ -3,7 +3,15 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+import os
+import re
 import textwrap
+from pathlib import Path
+
+# serialize every figure through orjson (listed in requirements.txt) instead of the stdlib json encoder
+pio.json.config.default_engine = "orjson"
 
 # -----------------------------
 # Page config & CSS
@@ -34,33 +42,115 @@ st.markdown(
 # -----------------------------
 # Data loader + preparation
 # -----------------------------
-@st.cache_data
+def read_csv_cached(path):
+    """
+    Read a CSV through a Parquet copy stored next to it.
+    The Parquet file is (re)written from the CSV when it is missing, older than the CSV or unreadable.
+    """
+    csv_path = Path(path)
+    parquet_path = csv_path.with_suffix('.parquet')
+    csv_mtime = csv_path.stat().st_mtime if csv_path.exists() else 0
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_mtime:
+        try:
+            return pd.read_parquet(parquet_path)
+        except Exception:
+            # damaged cache (e.g. an interrupted write): rebuild it from the CSV below
+            pass
+    data = pd.read_csv(csv_path, engine="pyarrow")
+    # write to a temp file and swap it in, so a crash never leaves a truncated cache behind
+    tmp_path = parquet_path.with_name(parquet_path.name + '.tmp')
+    try:
+        data.to_parquet(tmp_path, compression='snappy')
+        os.replace(tmp_path, parquet_path)
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        st.warning(f"⚠️ Could not write Parquet cache ({parquet_path}), the CSV will be parsed on every start. Error: {e}")
+    return data
+
+# loaders and preparation share one read-only object across reruns (no pickle round-trip per rerun)
+@st.cache_resource
 def load_transformed(path="data_final_transformed (1).csv"):
     """Load transformed dataset (used for most analyses)."""
     try:
-        df_raw = pd.read_csv(path)
+        df_raw = read_csv_cached(path)
     except Exception as e:
         st.warning(f"⚠️ Failed to load transformed dataset ({path}). Error: {e}")
         df_raw = pd.DataFrame()
+    # one-hot groups as 1-byte bool from the start (0/1 or text exports would otherwise load as int64/object)
+    onehot = [c for c in df_raw.columns if c.lower().startswith(('fakultas_', 'prodi_', 'masalah utama', 'jika diberikan'))]
+    to_cast = [c for c in onehot if not pd.api.types.is_bool_dtype(df_raw[c])]
+    if to_cast:
+        df_raw[to_cast] = onehot_matrix(df_raw[to_cast])
     return df_raw
 
-@st.cache_data
+@st.cache_resource
 def load_raw(path="Data_Responden.csv"):
     """Load raw dataset (used for quick statistics in sidebar)."""
     try:
-        raw = pd.read_csv(path)
+        raw = read_csv_cached(path)
     except Exception as e:
         st.warning(f"⚠️ Failed to load raw dataset ({path}). Error: {e}")
         raw = pd.DataFrame()
     return raw
 
+def onehot_matrix(onehot):
+    """
+    One-hot block as a single contiguous (rows x columns) bool matrix.
+    Non-numeric blocks are matched against the usual truthy strings instead of a plain bool cast.
+    """
+    if all(pd.api.types.is_numeric_dtype(t) for t in onehot.dtypes):
+        arr = onehot.fillna(0).to_numpy(dtype=np.bool_)
+    else:
+        arr = onehot.isin([1, True, '1', 'True', 'TRUE', 'true']).to_numpy()
+    return np.ascontiguousarray(arr)
+
+def first_selected(mat, labels, default=None):
+    """
+    Vectorized "first True column per row" over a one-hot bool matrix.
+    Returns an array of labels, `default` where no column is set.
+    """
+    return np.where(mat.any(axis=1), np.asarray(labels, dtype=object)[mat.argmax(axis=1)], default)
+
+def popcount_share(a_bits, b_bits):
+    """
+    Share (%) of the rows of each `a` column that also have each `b` column set, for two
+    row-packed one-hot groups (np.packbits(..., axis=0)). Returns float32 (b columns x a columns).
+    """
+    a_counts = np.bitwise_count(a_bits).sum(axis=0)
+    out = np.empty((b_bits.shape[1], a_bits.shape[1]), dtype=np.float32)
+    # one popcount pass per `a` column, scaled straight into the preallocated output
+    for i in range(a_bits.shape[1]):
+        out[:, i] = np.bitwise_count(a_bits[:, i, None] & b_bits).sum(axis=0) * (100 / max(a_counts[i], 1))
+    return out
+
+# DataFrame arguments come from the cached loaders, so an O(1) fingerprint
+# (shape, columns, buffer sizes) is enough to key the cache instead of hashing every cell
+FRAME_HASH_FUNCS = {pd.DataFrame: lambda d: (d.shape, tuple(d.columns), int(d.memory_usage().sum()))}
+
+# question prefixes of the one-hot groups (stripped once in prepare_transformed to get display labels)
+PROBLEM_PREFIX = 'Masalah utama yang paling sering Anda alami saat war KRS?_'
+PRIORITY_PREFIX = 'Jika diberikan kesempatan memilih, aspek apa yang paling prioritas untuk diperbaiki pada SIAMIK?_'
+
+# action-plan advice per priority keyword group, compiled once (first match wins)
+ACTION_RULES = [
+    (re.compile(r'kecepatan|server', re.I), "- Tingkatkan kapasitas server, optimalkan query, dan tambahkan caching atau CDN."),
+    (re.compile(r'notifikasi|notification', re.I), "- Implementasi notifikasi real-time (email/SMS/in-app) dan riwayat notifikasi yang lebih jelas."),
+    (re.compile(r'proses|approval|acc', re.I), "- Sederhanakan alur approval, tambahkan SLA, dan buat pengingat otomatis untuk status pengajuan."),
+]
+ACTION_DEFAULT = "- Lakukan survei kualitatif untuk desain solusi yang lebih tepat, uji coba kecil sebelum penerapan besar."
+
+@st.cache_resource(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
 def prepare_transformed(df_raw):
     """
     Clean & standardize column names, detect one-hot faculties/prodi, detect problem & priority one-hot groups.
     Returns (df, meta)
     """
     if df_raw is None or df_raw.empty:
-        return pd.DataFrame(), {'faculty_cols': [], 'prodi_cols': [], 'problem_cols': [], 'priority_cols': [], 'renamed': {}}
+        empty = np.zeros((0, 0), dtype=np.bool_)
+        return pd.DataFrame(), {'faculty_cols': [], 'prodi_cols': [], 'problem_cols': [], 'priority_cols': [], 'renamed': {},
+                                'faculty_labels': [], 'prodi_labels': [], 'problem_labels': [], 'priority_labels': [], 'downcast_cols': {}, 'faculty_mat': empty, 'prodi_mat': empty, 'problem_mat': empty, 'priority_mat': empty,
+                                'faculty_bits': empty.astype(np.uint8), 'problem_bits': empty.astype(np.uint8), 'priority_bits': empty.astype(np.uint8),
+                                'faculty_options': ('All',), 'prodi_options': ('All',), 'groups': {}, 'by_faculty': {}, 'by_prodi': {}}
 
     df = df_raw.copy()
 
@@ -81,67 +171,64 @@ def prepare_transformed(df_raw):
     rename_map = {k: v for k, v in rename_map.items() if k in df.columns}
     df = df.rename(columns=rename_map)
 
+    # float32 is plenty for the _std/_log scores and halves the bytes every reduction reads
+    float_cols = df.select_dtypes(include=['float64']).columns
+    df[float_cols] = df[float_cols].astype(np.float32)
+    # downcast column -> its df_raw name, so exports can read the original float64 values back
+    source_names = {v: k for k, v in rename_map.items()}
+    downcast_cols = {c: source_names.get(c, c) for c in float_cols}
+
     # detect one-hot faculty and prodi columns in dataset
     faculty_cols = [c for c in df.columns if c.startswith("Fakultas_") or c.lower().startswith('fakultas_')]
     prodi_cols = [c for c in df.columns if c.startswith("Prodi_") or c.lower().startswith('prodi_')]
 
+    # materialize each one-hot group once as a bool matrix (reused by the tabs via meta)
+    faculty_mat = onehot_matrix(df[faculty_cols])
+    prodi_mat = onehot_matrix(df[prodi_cols])
+    faculty_labels = [c[len('Fakultas_'):] for c in faculty_cols]
+    prodi_labels = [c[len('Prodi_'):] for c in prodi_cols]
+
     # fallback if not present: try to find singular faculty/prodi columns
     if faculty_cols:
         # get faculty name from the one-hot
-        try:
-            df['faculty'] = df[faculty_cols].idxmax(axis=1).str.replace('Fakultas_', '', regex=False)
-        except Exception:
-            # idxmax might fail if booleans aren't numeric; attempt alternative
-            df['faculty'] = df[faculty_cols].apply(lambda row: next((c.replace('Fakultas_', '') for c, v in row.items() if bool(v)), 'Unknown'), axis=1)
+        df['faculty'] = first_selected(faculty_mat, faculty_labels, 'Unknown')
     else:
         possible = [c for c in df.columns if 'fakultas' in c.lower() or 'faculty' in c.lower()]
         df['faculty'] = df[possible[0]] if possible else 'Unknown'
 
     if prodi_cols:
-        try:
-            df['study_program'] = df[prodi_cols].idxmax(axis=1).str.replace('Prodi_', '', regex=False)
-        except Exception:
-            df['study_program'] = df[prodi_cols].apply(lambda row: next((c.replace('Prodi_', '') for c, v in row.items() if bool(v)), 'Unknown'), axis=1)
+        df['study_program'] = first_selected(prodi_mat, prodi_labels, 'Unknown')
     else:
         possible_prodi = [c for c in df.columns if 'prodi' in c.lower() or 'study' in c.lower()]
         df['study_program'] = df[possible_prodi[0]] if possible_prodi else 'Unknown'
 
+    # categorical filters compare codes; the sorted categories double as the sidebar options
+    df['faculty'] = pd.Categorical(df['faculty'])
+    df['study_program'] = pd.Categorical(df['study_program'])
+
     # detect problem and priority one-hot groups
     problem_cols = [c for c in df.columns if c.startswith('Masalah utama') or 'masalah utama' in c.lower()]
     priority_cols = [c for c in df.columns if c.startswith('Jika diberikan kesempatan') or c.startswith('Jika diberikan') or 'prioritas' in c.lower()]
 
+    problem_mat = onehot_matrix(df[problem_cols])
+    priority_mat = onehot_matrix(df[priority_cols])
+    problem_labels = [c[len(PROBLEM_PREFIX):] if c.startswith(PROBLEM_PREFIX) else c for c in problem_cols]
+    priority_labels = [c[len(PRIORITY_PREFIX):] if c.startswith(PRIORITY_PREFIX) else c for c in priority_cols]
+
+    # store every one-hot group as plain bool columns (same truthiness as the matrices)
+    for cols, mat in ((faculty_cols, faculty_mat), (prodi_cols, prodi_mat), (problem_cols, problem_mat), (priority_cols, priority_mat)):
+        if cols:
+            df[cols] = mat
+
     # create readable 'main_problem' (first chosen problem) if problem_cols exist
     if problem_cols:
-        try:
-            df['main_problem'] = df[problem_cols].idxmax(axis=1).str.replace('Masalah utama yang paling sering Anda alami saat war KRS?_', '', regex=False)
-        except Exception:
-            # fallback: pick first True column per row
-            def pick_problem(row):
-                for c in problem_cols:
-                    try:
-                        if row.get(c) in [1, True, '1', 'True', 'TRUE', 'true']:
-                            return c.replace('Masalah utama yang paling sering Anda alami saat war KRS?_', '')
-                    except Exception:
-                        continue
-                return None
-            df['main_problem'] = df.apply(pick_problem, axis=1)
+        df['main_problem'] = first_selected(problem_mat, problem_labels)
     else:
         df['main_problem'] = None
 
     # create readable 'improvement_priority' if priority_cols exist
     if priority_cols:
-        try:
-            df['improvement_priority'] = df[priority_cols].idxmax(axis=1).str.replace('Jika diberikan kesempatan memilih, aspek apa yang paling prioritas untuk diperbaiki pada SIAMIK?_', '', regex=False)
-        except Exception:
-            def pick_priority(row):
-                for c in priority_cols:
-                    try:
-                        if row.get(c) in [1, True, '1', 'True', 'TRUE', 'true']:
-                            return c.replace('Jika diberikan kesempatan memilih, aspek apa yang paling prioritas untuk diperbaiki pada SIAMIK?_', '')
-                    except Exception:
-                        continue
-                return None
-            df['improvement_priority'] = df.apply(pick_priority, axis=1)
+        df['improvement_priority'] = first_selected(priority_mat, priority_labels)
     else:
         # try common alternative column names
         alt_cols = [c for c in df.columns if 'prioritas' in c.lower() or 'improvement' in c.lower() or 'Jika diberikan' in c]
@@ -155,12 +242,12 @@ def prepare_transformed(df_raw):
         try:
             df['lost_courses'] = df['lost_courses_lbl'].astype(bool)
         except Exception:
-            df['lost_courses'] = df['lost_courses_lbl'].apply(lambda x: str(x).lower() in ['true', '1', 'yes', 'y']) if 'lost_courses_lbl' in df.columns else False
+            df['lost_courses'] = df['lost_courses_lbl'].astype(str).str.lower().isin(['true', '1', 'yes', 'y'])
     elif 'lbl_Apakah Anda pernah kehilangan mata kuliah karena slot penuh akibat lambatnya SIAMIK?' in df.columns:
         try:
             df['lost_courses'] = df['lbl_Apakah Anda pernah kehilangan mata kuliah karena slot penuh akibat lambatnya SIAMIK?'].astype(bool)
         except Exception:
-            df['lost_courses'] = df.iloc[:, 0].apply(lambda x: str(x).lower() in ['true', '1', 'yes', 'y'])
+            df['lost_courses'] = df['lbl_Apakah Anda pernah kehilangan mata kuliah karena slot penuh akibat lambatnya SIAMIK?'].astype(str).str.lower().isin(['true', '1', 'yes', 'y'])
     else:
         df['lost_courses'] = False
 
@@ -169,7 +256,26 @@ def prepare_transformed(df_raw):
         'prodi_cols': prodi_cols,
         'problem_cols': problem_cols,
         'priority_cols': priority_cols,
-        'renamed': rename_map
+        'renamed': rename_map,
+        'faculty_labels': faculty_labels,
+        'prodi_labels': prodi_labels,
+        'problem_labels': problem_labels,
+        'priority_labels': priority_labels,
+        'downcast_cols': downcast_cols,
+        'faculty_mat': faculty_mat,
+        'prodi_mat': prodi_mat,
+        'problem_mat': problem_mat,
+        'priority_mat': priority_mat,
+        # rows packed 8 per byte for popcount cross-tabs (np.bitwise_count, numpy>=2.0)
+        'faculty_bits': np.packbits(faculty_mat, axis=0),
+        'problem_bits': np.packbits(problem_mat, axis=0),
+        'priority_bits': np.packbits(priority_mat, axis=0),
+        'faculty_options': ('All',) + tuple(df['faculty'].cat.categories),
+        'prodi_options': ('All',) + tuple(df['study_program'].cat.categories),
+        # row positions per filter value, so filtering is a dict lookup + gather
+        'groups': df.groupby(['faculty', 'study_program'], observed=True).indices,
+        'by_faculty': df.groupby('faculty', observed=True).indices,
+        'by_prodi': df.groupby('study_program', observed=True).indices
     }
     return df, meta
 
@@ -178,6 +284,158 @@ df_raw = load_transformed()
 raw_df = load_raw()
 df, meta = prepare_transformed(df_raw)
 
+def selection_rows(meta, faculty, prodi):
+    """Row positions of one faculty/prodi selection (None = every row), from the precomputed group indices."""
+    if faculty == "All" and prodi == "All":
+        return None
+    if prodi == "All":
+        idx = meta['by_faculty'].get(faculty)
+    elif faculty == "All":
+        idx = meta['by_prodi'].get(prodi)
+    else:
+        idx = meta['groups'].get((faculty, prodi))
+    return idx if idx is not None else np.array([], dtype=np.intp)
+
+# helper to get filtered df for tabs (memoized per faculty/prodi selection)
+# _meta is derived from base_df, so it is left out of the cache key; cache_resource hands back the
+# same read-only frame on every hit instead of unpickling a copy (the "All" case is df itself)
+@st.cache_resource(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def get_filtered_df(base_df, _meta, faculty, prodi):
+    # gather the precomputed row positions; no copy when nothing is filtered
+    rows = selection_rows(_meta, faculty, prodi)
+    return base_df if rows is None else base_df.take(rows)
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def group_counts(base_df, _meta, faculty, prodi, group):
+    """Per-column counts of a 'problem'/'priority' one-hot group for one selection, straight from the cached bool matrix."""
+    mat = _meta[f'{group}_mat']
+    rows = selection_rows(_meta, faculty, prodi)
+    return np.count_nonzero(mat if rows is None else mat[rows], axis=0)
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def problem_severity(base_df, _meta, faculty, prodi):
+    """Per-problem Count, AvgSatisfaction and SeverityScore (frequency * (5 - avg satisfaction)) for one selection."""
+    rows = selection_rows(_meta, faculty, prodi)
+    prob_mat = (_meta['problem_mat'] if rows is None else _meta['problem_mat'][rows]).astype(np.float32)
+    counts = group_counts(base_df, _meta, faculty, prodi, 'problem').astype(np.float32)
+    total_reports = counts.sum() if counts.sum() > 0 else 1
+    if 'overall_satisfaction_std' in base_df.columns:
+        sat = base_df['overall_satisfaction_std'].to_numpy(dtype=np.float32, na_value=np.nan)
+        sat = sat if rows is None else sat[rows]
+    else:
+        sat = np.full(len(prob_mat), np.nan, dtype=np.float32)
+    # one matrix product per aggregate instead of a DataFrame slice per problem
+    has_sat = ~np.isnan(sat)
+    sat_sums = prob_mat.T @ np.where(has_sat, sat, 0).astype(np.float32)
+    sat_valid = prob_mat.T @ has_sat.astype(np.float32)
+    avg_sat = np.where(sat_valid > 0, sat_sums / np.where(sat_valid > 0, sat_valid, 1), np.nan)
+    severity = np.where(sat_valid > 0, (5 - avg_sat) * (counts / total_reports), 0)
+    return pd.DataFrame({
+        'Problem': _meta['problem_labels'],
+        'Count': counts.astype(int),
+        'AvgSatisfaction': avg_sat,
+        'SeverityScore': severity
+    }).sort_values('SeverityScore', ascending=False).reset_index(drop=True)
+
+# same filter for the raw dataset (shared by the sidebar quick stats and the Overview tab)
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def get_filtered_raw(base_raw, faculty, prodi):
+    if base_raw is None or base_raw.empty:
+        return pd.DataFrame()
+    # raw file sample uses columns "Fakultas" and "Prodi" — handle gracefully
+    mask = np.ones(len(base_raw), dtype=bool)
+    if 'Fakultas' in base_raw.columns and faculty != "All":
+        # Some transformed faculty values might be trimmed; attempt exact match first, else case-insensitive
+        try:
+            mask &= (base_raw['Fakultas'] == faculty).to_numpy()
+        except Exception:
+            mask &= (base_raw['Fakultas'].str.lower() == str(faculty).lower()).to_numpy()
+    if 'Prodi' in base_raw.columns and prodi != "All":
+        try:
+            mask &= (base_raw['Prodi'] == prodi).to_numpy()
+        except Exception:
+            mask &= (base_raw['Prodi'].str.lower() == str(prodi).lower()).to_numpy()
+    return base_raw if mask.all() else base_raw[mask]
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_describe(base_df, _meta, faculty, prodi):
+    """Descriptive statistics of the numeric columns for one faculty/prodi selection."""
+    numeric = get_filtered_df(base_df, _meta, faculty, prodi).select_dtypes(include=[np.number])
+    return numeric.describe().T.round(3) if not numeric.empty else pd.DataFrame()
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_corr(base_df, _meta, faculty, prodi, cols):
+    """Correlation matrix of `cols` (tuple) for one faculty/prodi selection."""
+    return get_filtered_df(base_df, _meta, faculty, prodi)[list(cols)].corr()
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def to_csv_bytes(base_df, _meta, _source, faculty, prodi):
+    """
+    CSV export of one faculty/prodi selection, serialized once per selection.
+    The float32 score columns are exported from `_source` (the loaded frame) at their original float64 precision.
+    """
+    rows = selection_rows(_meta, faculty, prodi)
+    originals = {col: _source[src].to_numpy() if rows is None else _source[src].to_numpy()[rows]
+                 for col, src in _meta['downcast_cols'].items()}
+    return get_filtered_df(base_df, _meta, faculty, prodi).assign(**originals).to_csv(index=False).encode('utf-8')
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def cached_value_counts(base_df, _meta, faculty, prodi, col):
+    """(labels, counts) of `col`, most frequent first, for one faculty/prodi selection."""
+    counts = get_filtered_df(base_df, _meta, faculty, prodi)[col].value_counts()
+    return counts.index.to_numpy(dtype=object), counts.to_numpy()
+
+def histogram_figure(series, nbins, title):
+    """Histogram pre-binned with np.histogram, so only the bin counts are sent to the browser."""
+    # non-numeric entries (e.g. '-' placeholders in a score column) are dropped instead of failing the cast
+    values = pd.to_numeric(series, errors='coerce').dropna().to_numpy(dtype=float)
+    counts, edges = np.histogram(values, bins=nbins)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
+    fig.update_layout(title=title, xaxis_title=series.name, yaxis_title='count', bargap=0)
+    return fig
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def faculty_distribution(base_df, _meta):
+    """(labels, counts) of respondents per faculty, from the one-hot matrix when available."""
+    if _meta['faculty_cols']:
+        return list(_meta['faculty_labels']), _meta['faculty_mat'].sum(axis=0)
+    counts = base_df['faculty'].value_counts()
+    return counts.index.tolist(), counts.to_numpy()
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def faculty_share_matrices(base_df, _meta):
+    """{'problem': ..., 'priority': ...} float32 (group columns x faculties) % of each faculty's respondents ticking each column."""
+    # both groups share one popcount pass per faculty column
+    n_problem = _meta['problem_bits'].shape[1]
+    pct = popcount_share(_meta['faculty_bits'], np.hstack([_meta['problem_bits'], _meta['priority_bits']]))
+    return {'problem': pct[:n_problem], 'priority': pct[n_problem:]}
+
+def render_faculty_heatmap(base_df, meta, group, axis_title, title):
+    """Faculty x 'problem'/'priority' share heatmap (shared by the Problems and Priorities tabs)."""
+    # popcount cross-tab over the packed one-hot bits, cached once per dataset
+    pct = faculty_share_matrices(base_df, meta)[group]
+    # raw float32 z goes out as a base64 typed array, no DataFrame round-trip
+    fig = go.Figure(go.Heatmap(z=pct, x=meta['faculty_labels'], y=meta[f'{group}_labels'], colorscale='YlOrRd', colorbar=dict(title='Percentage'),
+                               hovertemplate=f'Faculty: %{{x}}<br>{axis_title}: %{{y}}<br>Percentage: %{{z:.1f}}%<extra></extra>'))
+    fig.update_layout(title=title, xaxis_title="Faculty", yaxis_title=axis_title, yaxis_autorange='reversed')
+    st.plotly_chart(fig, use_container_width=True)
+
+@st.cache_data(show_spinner=False)
+def render_overview_cards(total, lost_rate, avg_login, avg_acc_wait):
+    """HTML for the four Overview metric cards as one flex row, built once per set of values."""
+    cards = [
+        ("#6366f1, #7e22ce", "Total Respondents", f"{total}", "Survey participants (filtered)"),
+        ("#ec4899, #f43f5e", "Lost Courses", f"{lost_rate:.1f}%", "Due to full slots"),
+        ("#06b6d4, #3b82f6", "Avg Login (raw)", f"{avg_login:.2f}", "Minutes (raw data)"),
+        ("#f97316, #facc15", "ACC Wait (raw)", f"{avg_acc_wait:.2f}", "Minutes (raw data)"),
+    ]
+    body = "".join(
+        f'<div style="flex:1; background: linear-gradient(135deg, {colors}); padding: 25px; border-radius: 15px; color: white;">'
+        f'<h3>{title}</h3><h1 style="margin-top: 0;">{value}</h1><p>{note}</p></div>'
+        for colors, title, value, note in cards
+    )
+    return f'<div style="display:flex; gap:16px;">{body}</div>'
+
 # -----------------------------
 # Sidebar: filters and quick stats
 # -----------------------------
@@ -186,11 +444,9 @@ with st.sidebar:
     st.markdown("### 🎯 Filters (interactive)")
 
     # Build faculty / prodi options from transformed df (so tab filters remain consistent)
-    faculties = ["All"] + sorted(df['faculty'].unique().tolist()) if 'faculty' in df.columns else ["All"]
-    selected_faculty = st.selectbox("Select Faculty", faculties, index=0)
+    selected_faculty = st.selectbox("Select Faculty", meta['faculty_options'], index=0)
 
-    prodis = ["All"] + sorted(df['study_program'].unique().tolist()) if 'study_program' in df.columns else ["All"]
-    selected_prodi = st.selectbox("Select Study Program (Prodi)", prodis, index=0)
+    selected_prodi = st.selectbox("Select Study Program (Prodi)", meta['prodi_options'], index=0)
 
     st.markdown("---")
     st.markdown("### 📊 Quick Statistics")
@@ -198,29 +454,12 @@ with st.sidebar:
     # -----------------------------
     # Filter transformed data for download and other UI consistency (kept for compatibility)
     # -----------------------------
-    filtered_transformed = df.copy()
-    if selected_faculty != "All":
-        filtered_transformed = filtered_transformed[filtered_transformed['faculty'] == selected_faculty]
-    if selected_prodi != "All":
-        filtered_transformed = filtered_transformed[filtered_transformed['study_program'] == selected_prodi]
+    filtered_transformed = get_filtered_df(df, meta, selected_faculty, selected_prodi)
 
     # -----------------------------
     # Filter raw_df by the same selected faculty & prodi (if those columns exist in raw)
     # -----------------------------
-    filtered_raw = raw_df.copy() if raw_df is not None else pd.DataFrame()
-    # raw file sample uses columns "Fakultas" and "Prodi" — handle gracefully
-    if not filtered_raw.empty:
-        if 'Fakultas' in filtered_raw.columns and selected_faculty != "All":
-            # Some transformed faculty values might be trimmed; attempt exact match first, else case-insensitive
-            try:
-                filtered_raw = filtered_raw[filtered_raw['Fakultas'] == selected_faculty]
-            except Exception:
-                filtered_raw = filtered_raw[filtered_raw['Fakultas'].str.lower() == str(selected_faculty).lower()]
-        if 'Prodi' in filtered_raw.columns and selected_prodi != "All":
-            try:
-                filtered_raw = filtered_raw[filtered_raw['Prodi'] == selected_prodi]
-            except Exception:
-                filtered_raw = filtered_raw[filtered_raw['Prodi'].str.lower() == str(selected_prodi).lower()]
+    filtered_raw = get_filtered_raw(raw_df, selected_faculty, selected_prodi)
 
     # -----------------------------
     # Raw data column names (expected)
@@ -229,24 +468,21 @@ with st.sidebar:
     col_sat = "Seberapa puas Anda secara keseluruhan terhadap SIAMIK dalam proses War KRS dan ACC?"
     col_lost = "Apakah Anda pernah kehilangan mata kuliah karena slot penuh akibat lambatnya SIAMIK?"
 
-    # Convert raw numeric columns to numeric if present (defensive)
-    if not filtered_raw.empty:
-        for c in [col_ease, col_sat]:
-            if c in filtered_raw.columns:
-                filtered_raw[c] = pd.to_numeric(filtered_raw[c], errors='coerce')
+    # Convert raw numeric columns to numeric if present (defensive, without writing back into the raw frame)
+    raw_numeric = {c: pd.to_numeric(filtered_raw[c], errors='coerce') for c in [col_ease, col_sat] if c in filtered_raw.columns}
 
     # Total respondents (based on raw_df filter)
     total_respondents = len(filtered_raw) if (filtered_raw is not None and not filtered_raw.empty) else 0
 
     # Compute averages from raw (fallback to transformed if raw not available)
-    if col_sat in filtered_raw.columns:
-        avg_satisfaction = filtered_raw[col_sat].mean(skipna=True)
+    if col_sat in raw_numeric:
+        avg_satisfaction = raw_numeric[col_sat].mean(skipna=True)
     else:
         # fallback to transformed columns (if exist)
         avg_satisfaction = filtered_transformed['overall_satisfaction_std'].mean() if 'overall_satisfaction_std' in filtered_transformed.columns else np.nan
 
-    if col_ease in filtered_raw.columns:
-        avg_ease = filtered_raw[col_ease].mean(skipna=True)
+    if col_ease in raw_numeric:
+        avg_ease = raw_numeric[col_ease].mean(skipna=True)
     else:
         avg_ease = filtered_transformed['ease_of_access_std'].mean() if 'ease_of_access_std' in filtered_transformed.columns else np.nan
 
@@ -273,8 +509,7 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### 🔁 Export / Download")
     # Keep previous behavior: offer download of filtered transformed data
-    if st.button("Download filtered CSV"):
-        st.download_button("Download CSV", filtered_transformed.to_csv(index=False), file_name="siamik_filtered.csv", mime="text/csv")
+    st.download_button("Download filtered CSV", data=to_csv_bytes(df, meta, df_raw, selected_faculty, selected_prodi), file_name="siamik_filtered.csv", mime="text/csv")
 
     st.markdown("---")
     st.caption("Quick stats use raw dataset (Data_Responden.csv) where available; main analysis uses transformed dataset.")
@@ -286,15 +521,6 @@ st.title("🎓 SIAMIK Student Portal Dashboard")
 st.markdown("Transformed survey data analysis — descriptive statistics, performance, problems and improvement priorities.")
 st.markdown("Use the left sidebar to filter by Faculty / Study Program. All visuals update dynamically.")
 
-# helper to get filtered df for tabs (based on current sidebar selections)
-def get_filtered_df(base_df):
-    df_f = base_df.copy()
-    if 'faculty' in df_f.columns and selected_faculty != "All":
-        df_f = df_f[df_f['faculty'] == selected_faculty]
-    if 'study_program' in df_f.columns and selected_prodi != "All":
-        df_f = df_f[df_f['study_program'] == selected_prodi]
-    return df_f
-
 # -----------------------------
 # Tabs
 # -----------------------------
@@ -311,7 +537,7 @@ tab_overview, tab_perf, tab_sat, tab_prob, tab_prio = st.tabs([
 # -----------------------------
 with tab_overview:
     st.header("📈 Overview — Summary & Key Insights")
-    dff = get_filtered_df(df)
+    dff = get_filtered_df(df, meta, selected_faculty, selected_prodi)
 
     # 🧾 Dataset Description (Bilingual)
     with st.expander("📘 Dataset Description / Deskripsi Dataset", expanded=True):
@@ -340,13 +566,8 @@ with tab_overview:
      # ==============================
     # 🎯 Overview Metric Cards (pakai data mentah)
     # ==============================
-    raw_filtered = raw_df.copy()
-
-    # Filter sesuai fakultas/prodi yang dipilih
-    if selected_faculty != "All" and 'Fakultas' in raw_filtered.columns:
-        raw_filtered = raw_filtered[raw_filtered['Fakultas'] == selected_faculty]
-    if selected_prodi != "All" and 'Prodi' in raw_filtered.columns:
-        raw_filtered = raw_filtered[raw_filtered['Prodi'] == selected_prodi]
+    # Filter sesuai fakultas/prodi yang dipilih (hasil yang sama dengan sidebar, dari cache)
+    raw_filtered = get_filtered_raw(raw_df, selected_faculty, selected_prodi)
 
     # Hitung metrik dari data mentah
     total_respondents = len(raw_filtered)
@@ -370,42 +591,7 @@ with tab_overview:
     # 🎨 Tampilan Metric Cards
     # ==============================
 
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.markdown(f"""
-        <div style="background: linear-gradient(135deg, #6366f1, #7e22ce); padding: 25px; border-radius: 15px; color: white;">
-            <h3>Total Respondents</h3>
-            <h1 style="margin-top: 0;">{total_respondents}</h1>
-            <p>Survey participants (filtered)</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col2:
-        st.markdown(f"""
-        <div style="background: linear-gradient(135deg, #ec4899, #f43f5e); padding: 25px; border-radius: 15px; color: white;">
-            <h3>Lost Courses</h3>
-            <h1 style="margin-top: 0;">{lost_courses_rate:.1f}%</h1>
-            <p>Due to full slots</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col3:
-        st.markdown(f"""
-        <div style="background: linear-gradient(135deg, #06b6d4, #3b82f6); padding: 25px; border-radius: 15px; color: white;">
-            <h3>Avg Login (raw)</h3>
-            <h1 style="margin-top: 0;">{avg_login:.2f}</h1>
-            <p>Minutes (raw data)</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col4:
-        st.markdown(f"""
-        <div style="background: linear-gradient(135deg, #f97316, #facc15); padding: 25px; border-radius: 15px; color: white;">
-            <h3>ACC Wait (raw)</h3>
-            <h1 style="margin-top: 0;">{avg_acc_wait:.2f}</h1>
-            <p>Minutes (raw data)</p>
-        </div>
-        """, unsafe_allow_html=True)
+    st.markdown(render_overview_cards(total_respondents, lost_courses_rate, avg_login, avg_acc_wait), unsafe_allow_html=True)
 
        # ==============================
     # 📊 Data Preview + Statistics (from RAW data)
@@ -413,14 +599,8 @@ with tab_overview:
     st.markdown("---")
     st.subheader("🔍 Data Preview (Raw Dataset)")
 
-    # Filter raw_df by selected faculty & prodi
-    raw_filtered = raw_df.copy()
-    if not raw_filtered.empty:
-        if 'Fakultas' in raw_filtered.columns and selected_faculty != "All":
-            raw_filtered = raw_filtered[raw_filtered['Fakultas'] == selected_faculty]
-        if 'Prodi' in raw_filtered.columns and selected_prodi != "All":
-            raw_filtered = raw_filtered[raw_filtered['Prodi'] == selected_prodi]
-
+    # raw_filtered (selected faculty & prodi) is reused from the metric cards above
+    if not raw_df.empty:
         # Show first 10 rows
         st.dataframe(raw_filtered.head(10), use_container_width=True)
     else:
@@ -430,10 +610,9 @@ with tab_overview:
 
     if not dff.empty:
     # Pilih hanya kolom numerik dari data hasil transformasi
-        numeric_transformed = dff.select_dtypes(include=[np.number])
+        desc_transformed = compute_describe(df, meta, selected_faculty, selected_prodi)
     
-        if not numeric_transformed.empty:
-            desc_transformed = numeric_transformed.describe().T.round(3)
+        if not desc_transformed.empty:
             st.dataframe(desc_transformed, use_container_width=True)
         else:
             st.info("No numeric columns found in transformed dataset.")
@@ -446,41 +625,34 @@ with tab_overview:
     # ==============================
     st.markdown("---")
     st.subheader("👥 Respondent Distribution by Faculty")
-    if meta['faculty_cols']:
-        fac_counts = {c.replace('Fakultas_', ''): int(df[c].sum()) for c in meta['faculty_cols']}
-        fac_df = pd.DataFrame({'Faculty': list(fac_counts.keys()), 'Count': list(fac_counts.values())})
-        fig = px.pie(fac_df, values='Count', names='Faculty', title='Respondent Distribution (by Faculty)', hole=0.4)
-        fig.update_traces(textinfo='percent+label')
+    if meta['faculty_cols'] or 'faculty' in df.columns:
+        fac_labels, fac_counts = faculty_distribution(df, meta)
+        fig = go.Figure([go.Pie(labels=fac_labels, values=fac_counts, hole=0.4, textinfo='percent+label',
+                                hovertemplate='Faculty=%{label}<br>Count=%{value}<extra></extra>')])
+        fig.update_layout(title='Respondent Distribution (by Faculty)')
         st.plotly_chart(fig, use_container_width=True)
     else:
-        if 'faculty' in df.columns:
-            fac_df = df['faculty'].value_counts().reset_index()
-            fac_df.columns = ['Faculty', 'Count']
-            fig = px.pie(fac_df, values='Count', names='Faculty', title='Respondent Distribution (by Faculty)', hole=0.4)
-            fig.update_traces(textinfo='percent+label')
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("Faculty one-hot columns not found in dataset.")
+        st.info("Faculty one-hot columns not found in dataset.")
 
 # -----------------------------
 # TAB: System Performance
 # -----------------------------
 with tab_perf:
     st.header("System Performance Analysis")
-    dff = get_filtered_df(df)
+    dff = get_filtered_df(df, meta, selected_faculty, selected_prodi)
 
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Login Duration Distribution")
         # prefer log transformed column if available
         if 'login_duration_log' in dff.columns:
-            fig = px.histogram(dff, x='login_duration_log', nbins=25, title='Login Duration (log-transformed)')
+            fig = histogram_figure(dff['login_duration_log'], nbins=25, title='Login Duration (log-transformed)')
             # mean line
             mean_val = dff['login_duration_log'].mean()
             fig.add_vline(x=mean_val, line_dash='dash', annotation_text=f"Mean: {mean_val:.2f}")
             st.plotly_chart(fig, use_container_width=True)
         elif 'login_duration_std' in dff.columns:
-            fig = px.histogram(dff, x='login_duration_std', nbins=25, title='Login Duration (standardized)')
+            fig = histogram_figure(dff['login_duration_std'], nbins=25, title='Login Duration (standardized)')
             mean_val = dff['login_duration_std'].mean()
             fig.add_vline(x=mean_val, line_dash='dash', annotation_text=f"Mean: {mean_val:.2f}")
             st.plotly_chart(fig, use_container_width=True)
@@ -491,7 +663,7 @@ with tab_perf:
         st.subheader("Login Error Frequency")
         if 'login_errors_std' in dff.columns:
             err_counts = dff['login_errors_std'].round(2)
-            fig = px.histogram(dff, x='login_errors_std', nbins=10, title='Login Errors (std)')
+            fig = histogram_figure(dff['login_errors_std'], nbins=10, title='Login Errors (std)')
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("Login errors column not found.")
@@ -500,13 +672,13 @@ with tab_perf:
     st.subheader("ACC Waiting Time by Faculty (transformed)")
     acc_col = 'acc_wait_log' if 'acc_wait_log' in df.columns else 'acc_wait_std' if 'acc_wait_std' in df.columns else None
     if acc_col and meta['faculty_cols']:
-        acc_means = []
-        for fcol in meta['faculty_cols']:
-            fac_name = fcol.replace('Fakultas_', '')
-            mask = df[fcol] == True
-            if mask.sum() > 0:
-                acc_means.append({'Faculty': fac_name, 'MeanACC': float(df.loc[mask, acc_col].mean()) if pd.api.types.is_numeric_dtype(df.loc[mask, acc_col]) else np.nan})
-        acc_df = pd.DataFrame(acc_means).sort_values('MeanACC', ascending=False)
+        # one grouped mean over the categorical faculty column (observed groups only, no label sort)
+        if pd.api.types.is_numeric_dtype(df[acc_col]):
+            acc_means = df.groupby('faculty', observed=True, sort=False)[acc_col].mean().astype(float)
+        else:
+            acc_means = pd.Series(np.nan, index=df['faculty'].unique())
+        acc_means = acc_means[acc_means.index.isin(meta['faculty_labels'])]
+        acc_df = pd.DataFrame({'Faculty': acc_means.index.astype(str), 'MeanACC': acc_means.to_numpy()}).sort_values('MeanACC', ascending=False)
         fig = px.bar(acc_df, x='Faculty', y='MeanACC', title='ACC Wait Time by Faculty (transformed)')
         st.plotly_chart(fig, use_container_width=True)
     else:
@@ -517,16 +689,18 @@ with tab_perf:
     st.subheader("Performance Metrics Summary")
     candidate_metrics = ['ease_of_access_std', 'login_duration_std', 'login_duration_log', 'login_errors_std', 'acc_wait_std', 'acc_wait_log', 'overall_satisfaction_std']
     available = [c for c in candidate_metrics if c in dff.columns]
-    perf_rows = []
-    for c in available:
-        perf_rows.append({
-            'Metric': c,
-            'Mean': f"{dff[c].mean():.2f}" if pd.api.types.is_numeric_dtype(dff[c]) else 'N/A',
-            'Median': f"{dff[c].median():.2f}" if pd.api.types.is_numeric_dtype(dff[c]) else 'N/A',
-            'StdDev': f"{dff[c].std():.2f}" if pd.api.types.is_numeric_dtype(dff[c]) else 'N/A'
-        })
-    if perf_rows:
-        st.table(pd.DataFrame(perf_rows))
+    if available:
+        # one aggregation over the numeric metrics; non-numeric ones stay as N/A rows
+        numeric_metrics = [c for c in available if pd.api.types.is_numeric_dtype(dff[c])]
+        if numeric_metrics:
+            perf_df = (dff[numeric_metrics].agg(['mean', 'median', 'std']).T
+                       .reindex(available)
+                       .rename(columns={'mean': 'Mean', 'median': 'Median', 'std': 'StdDev'}))
+        else:
+            # agg() has nothing to concatenate without numeric columns
+            perf_df = pd.DataFrame(np.nan, index=available, columns=['Mean', 'Median', 'StdDev'])
+        perf_df = perf_df.rename_axis('Metric').reset_index()
+        st.table(perf_df.style.format("{:.2f}", subset=['Mean', 'Median', 'StdDev'], na_rep='N/A'))
     else:
         st.info("No performance metrics found for summary table.")
 
@@ -535,13 +709,13 @@ with tab_perf:
 # -----------------------------
 with tab_sat:
     st.header("Satisfaction & Correlation")
-    dff = get_filtered_df(df)
+    dff = get_filtered_df(df, meta, selected_faculty, selected_prodi)
 
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Overall Satisfaction Distribution")
         if 'overall_satisfaction_std' in dff.columns:
-            fig = px.histogram(dff, x='overall_satisfaction_std', nbins=6, title='Overall Satisfaction (standardized)')
+            fig = histogram_figure(dff['overall_satisfaction_std'], nbins=6, title='Overall Satisfaction (standardized)')
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("Overall satisfaction column not found.")
@@ -549,7 +723,7 @@ with tab_sat:
     with col2:
         st.subheader("Ease of Access Distribution")
         if 'ease_of_access_std' in dff.columns:
-            fig = px.histogram(dff, x='ease_of_access_std', nbins=6, title='Ease of Access (standardized)')
+            fig = histogram_figure(dff['ease_of_access_std'], nbins=6, title='Ease of Access (standardized)')
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("Ease of access column not found.")
@@ -560,7 +734,7 @@ with tab_sat:
     numeric_cols = [c for c in dff.columns if any(k in c for k in ['_std', '_log', 'ease_of_access', 'overall_satisfaction', 'system_quality'])]
     numeric_cols = [c for c in numeric_cols if pd.api.types.is_numeric_dtype(dff[c])]
     if numeric_cols:
-        corr = dff[numeric_cols].corr()
+        corr = compute_corr(df, meta, selected_faculty, selected_prodi, tuple(numeric_cols))
         fig = px.imshow(corr, text_auto=True, aspect="auto", color_continuous_scale='RdBu_r', title="Correlation Heatmap")
         st.plotly_chart(fig, use_container_width=True)
         st.markdown("**Interpretation tip:** Correlation values close to 1 or -1 indicate strong relationships.")
@@ -572,35 +746,25 @@ with tab_sat:
 # -----------------------------
 with tab_prob:
     st.header("Common Problems during War KRS")
-    dff = get_filtered_df(df)
+    dff = get_filtered_df(df, meta, selected_faculty, selected_prodi)
     problem_cols = meta['problem_cols']
     if problem_cols:
-        # counts per problem
-        prob_counts = {}
-        try:
-            prob_counts = {p.replace('Masalah utama yang paling sering Anda alami saat war KRS?_', ''): int(dff[p].sum()) for p in problem_cols}
-            prob_df = pd.DataFrame({'Problem': list(prob_counts.keys()), 'Count': list(prob_counts.values())}).sort_values('Count', ascending=False)
-            fig = px.bar(prob_df, x='Count', y='Problem', orientation='h', title='Reported Problems Frequency', color='Count', color_continuous_scale='Reds', text='Count')
-            fig.update_traces(textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
-        except Exception:
-            st.info("Could not compute problem frequencies. Check problem one-hot columns.")
+        # counts per problem, from the cached bool matrix rows of this selection
+        prob_counts = group_counts(df, meta, selected_faculty, selected_prodi, 'problem')
+        # plain arrays instead of a DataFrame; text_auto reuses x rather than shipping a second text array
+        order = np.argsort(-prob_counts, kind='stable')
+        counts_sorted = prob_counts[order]
+        fig = px.bar(x=counts_sorted, y=np.asarray(meta['problem_labels'], dtype=object)[order], orientation='h', title='Reported Problems Frequency',
+                     color=counts_sorted, color_continuous_scale='Reds', text_auto=True, labels={'x': 'Count', 'y': 'Problem', 'color': 'Count'})
+        fig.update_traces(textposition='outside')
+        st.plotly_chart(fig, use_container_width=True)
 
         # severity calculation (frequency * (5 - avg satisfaction))
         st.markdown("### Problem severity (proxy)")
-        total_reports = prob_df['Count'].sum() if 'prob_df' in locals() and prob_df['Count'].sum() > 0 else 1
-        severity_records = []
-        for pcol in problem_cols:
-            label = pcol.replace('Masalah utama yang paling sering Anda alami saat war KRS?_', '')
-            reporters = dff[dff[pcol] == True] if pcol in dff.columns else pd.DataFrame()
-            cnt = int(reporters.shape[0]) if not reporters.empty else 0
-            avg_sat_reporters = reporters['overall_satisfaction_std'].mean() if 'overall_satisfaction_std' in reporters.columns and reporters.shape[0] > 0 else np.nan
-            severity = (5 - avg_sat_reporters) * (cnt / total_reports) if not np.isnan(avg_sat_reporters) else 0
-            severity_records.append({'Problem': label, 'Count': cnt, 'AvgSatisfaction': avg_sat_reporters, 'SeverityScore': severity})
-        sev_df = pd.DataFrame(severity_records).sort_values('SeverityScore', ascending=False).reset_index(drop=True)
+        sev_df = problem_severity(df, meta, selected_faculty, selected_prodi)
         if not sev_df.empty:
             st.dataframe(sev_df.round(3), use_container_width=True)
-            fig2 = px.scatter(sev_df, x='Count', y='AvgSatisfaction', size='SeverityScore', color='SeverityScore', text='Problem', title='Problem Severity (freq vs avg satisfaction)')
+            fig2 = px.scatter(sev_df, x='Count', y='AvgSatisfaction', size='SeverityScore', color='SeverityScore', text='Problem', title='Problem Severity (freq vs avg satisfaction)', render_mode='webgl')
             fig2.update_traces(textposition='top center')
             st.plotly_chart(fig2, use_container_width=True)
         else:
@@ -610,25 +774,15 @@ with tab_prob:
         st.markdown("---")
         st.subheader("Problem distribution by Faculty (%)")
         if meta['faculty_cols']:
-            fac_matrix = {}
-            for fcol in meta['faculty_cols']:
-                fac = fcol.replace('Fakultas_', '')
-                fac_matrix[fac] = []
-                for pcol in problem_cols:
-                    mask = df[fcol] == True
-                    pct = df.loc[mask, pcol].mean() * 100 if mask.sum() > 0 else 0.0
-                    fac_matrix[fac].append(pct)
-            fac_prob_df = pd.DataFrame(fac_matrix, index=[p.replace('Masalah utama yang paling sering Anda alami saat war KRS?_', '') for p in problem_cols])
-            fig3 = px.imshow(fac_prob_df, labels=dict(x="Faculty", y="Problem", color="Percentage"), title="Problem Distribution Across Faculties (%)", aspect="auto", color_continuous_scale='YlOrRd')
-            st.plotly_chart(fig3, use_container_width=True)
+            render_faculty_heatmap(df, meta, 'problem', "Problem", "Problem Distribution Across Faculties (%)")
         else:
             st.info("Faculty one-hot columns not available for this chart.")
     else:
         # fallback: if 'main_problem' exists as a column
         if 'main_problem' in dff.columns:
-            prob_df = dff['main_problem'].value_counts().reset_index()
-            prob_df.columns = ['Problem', 'Count']
-            fig = px.bar(prob_df, x='Count', y='Problem', orientation='h', title='Reported Problems Frequency', color='Count', color_continuous_scale='Reds', text='Count')
+            prob_labels, counts_sorted = cached_value_counts(df, meta, selected_faculty, selected_prodi, 'main_problem')
+            fig = px.bar(x=counts_sorted, y=prob_labels, orientation='h', title='Reported Problems Frequency',
+                         color=counts_sorted, color_continuous_scale='Reds', text_auto=True, labels={'x': 'Count', 'y': 'Problem', 'color': 'Count'})
             fig.update_traces(textposition='outside')
             st.plotly_chart(fig, use_container_width=True)
         else:
@@ -639,159 +793,118 @@ with tab_prob:
 # -----------------------------
 with tab_prio:
     st.header("Improvement Priorities (Student Requests)")
-    dff = get_filtered_df(df)
+    dff = get_filtered_df(df, meta, selected_faculty, selected_prodi)
     pr_cols = meta['priority_cols']
 
-    # Build priority counts robustly (use one-hot columns if available, else fallback)
+    # Build priority counts (use one-hot columns if available, else fallback)
     if pr_cols:
-        try:
-            pr_counts = {
-                p.replace(
-                    'Jika diberikan kesempatan memilih, aspek apa yang paling prioritas untuk diperbaiki pada SIAMIK?_',
-                    ''
-                ): int(dff[p].sum())
-                for p in pr_cols
-            }
-            pr_df = pd.DataFrame({
-                'Priority': list(pr_counts.keys()),
-                'Count': list(pr_counts.values())
-            }).sort_values('Count', ascending=False)
-        except Exception:
-            records = []
-            for p in pr_cols:
-                name = p.replace(
-                    'Jika diberikan kesempatan memilih, aspek apa yang paling prioritas untuk diperbaiki pada SIAMIK?_',
-                    ''
-                )
-                try:
-                    cnt = int(dff[p].astype(bool).sum())
-                except Exception:
-                    cnt = int(dff[p].sum()) if p in dff.columns else 0
-                records.append({'Priority': name, 'Count': cnt})
-            pr_df = pd.DataFrame(records).sort_values('Count', ascending=False)
+        # counted on the cached bool matrix, so the one-hot block of dff is never copied out
+        pr_labels = np.asarray(meta['priority_labels'], dtype=object)
+        pr_counts = group_counts(df, meta, selected_faculty, selected_prodi, 'priority')
     else:
         # fallback: single-column priority
         if 'improvement_priority' in dff.columns and dff['improvement_priority'].notna().sum() > 0:
-            pr_df = dff['improvement_priority'].value_counts().reset_index()
-            pr_df.columns = ['Priority', 'Count']
-            pr_df = pr_df.sort_values('Count', ascending=False)
+            pr_labels, pr_counts = cached_value_counts(df, meta, selected_faculty, selected_prodi, 'improvement_priority')
         else:
-            pr_df = pd.DataFrame(columns=['Priority', 'Count'])
+            pr_labels = np.array([], dtype=object)
+            pr_counts = np.array([], dtype=int)
+
+    # one descending order shared by the charts, the table and the action plan
+    order_desc = np.argsort(-pr_counts, kind='stable')
+    sorted_labels = pr_labels[order_desc]
+    sorted_counts = pr_counts[order_desc]
 
     # ======================================================
     # Jika tidak ada data, tampilkan pesan
     # ======================================================
-    if pr_df.empty or pr_df['Count'].sum() == 0:
+    if sorted_counts.sum() == 0:
         st.info("No improvement priority information found.")
     else:
         # ======================================================
         # Siapkan data
         # ======================================================
-        sun_df = pr_df.copy()
-        sun_df['root'] = 'All'
-        total = sun_df['Count'].sum() if sun_df['Count'].sum() > 0 else 1
-        sun_df['percentage'] = (sun_df['Count'] / total * 100).round(1)
+        # (labels, counts, pct) stay parallel arrays; a DataFrame is only built for the table
+        sorted_pct = (sorted_counts / sorted_counts.sum() * 100).round(1)
 
         # ======================================================
-        # Layout dua kolom untuk grafik
+        # SUNBURST + BAR (Ranking) dalam satu figure
         # ======================================================
-        col1, col2 = st.columns([1, 1])
         chart_height = 480
+        fig = make_subplots(
+            rows=1, cols=2,
+            column_widths=[0.5, 0.5],
+            specs=[[{'type': 'domain'}, {'type': 'xy'}]],
+            subplot_titles=('Improvement Priority Distribution', 'Top Priorities (Ranking)')
+        )
 
-        # ======================================================
-        # SUNBURST Chart
-        # ======================================================
-        with col1:
-            fig = px.sunburst(
-                sun_df,
-                path=['root', 'Priority'],
-                values='Count',
-                title='Improvement Priority Distribution',
-                color='Count',
-                color_continuous_scale='Blues',
-                height=chart_height
-            )
-            fig.update_traces(
-                textinfo='label+percent entry',
-                insidetextorientation='radial',
-                hovertemplate='<b>%{label}</b><br>Count: %{value}<extra></extra>'
-            )
-            st.plotly_chart(fig, use_container_width=True, key="sunburst_chart")
-
-        # ======================================================
-        # BAR Chart (Ranking)
-        # ======================================================
-        with col2:
-            fig2 = px.bar(
-                sun_df.sort_values('Count', ascending=True),
-                x='Count',
-                y='Priority',
-                orientation='h',
-                text='Count',
-                title='Top Priorities (Ranking)',
-                color='Count',
-                color_continuous_scale='Blues',
-                height=chart_height
-            )
-            fig2.update_traces(textposition='outside')
-            fig2.update_layout(
-                yaxis_title='Priority',
-                xaxis_title='Jumlah Responden',
-                margin=dict(l=20, r=20, t=50, b=20)
-            )
-            st.plotly_chart(fig2, use_container_width=True, key="bar_chart")
+        # sunburst (left cell): root + one ring of leaves, so the hierarchy is built by hand;
+        # the root is coloured by the count-weighted mean like px.sunburst did
+        total = sorted_counts.sum()
+        sun_values = np.concatenate([[total], sorted_counts])
+        fig.add_trace(go.Sunburst(
+            ids=np.concatenate([['All'], 'All/' + sorted_labels.astype(str).astype(object)]),
+            labels=np.concatenate([['All'], sorted_labels]),
+            parents=np.array([''] + ['All'] * len(sorted_labels), dtype=object),
+            values=sun_values,
+            branchvalues='total',
+            marker=dict(colors=np.concatenate([[(sorted_counts ** 2).sum() / total], sorted_counts]), coloraxis='coloraxis'),
+            textinfo='label+percent entry',
+            insidetextorientation='radial',
+            hovertemplate='<b>%{label}</b><br>Count: %{value}<extra></extra>'
+        ), row=1, col=1)
+
+        # ranking bar (right cell); ascending ranking = reversed views of the shared order
+        ranked_counts = sorted_counts[::-1]
+        fig.add_trace(go.Bar(
+            x=ranked_counts,
+            y=sorted_labels[::-1],
+            orientation='h',
+            texttemplate='%{x}',
+            textposition='outside',
+            marker=dict(color=ranked_counts, coloraxis='coloraxis2'),
+            hovertemplate='Count=%{x}<br>Priority=%{y}<extra></extra>',
+            showlegend=False
+        ), row=1, col=2)
+
+        fig.update_xaxes(title_text='Jumlah Responden', row=1, col=2)
+        fig.update_yaxes(title_text='Priority', row=1, col=2)
+        fig.update_layout(
+            coloraxis=dict(colorscale='Blues', showscale=False),
+            coloraxis2=dict(colorscale='Blues', colorbar=dict(title='Count')),
+            height=chart_height,
+            margin=dict(l=20, r=20, t=50, b=20)
+        )
+        st.plotly_chart(fig, use_container_width=True, key="priority_charts")
 
         # ======================================================
         # Tabel & Insight
         # ======================================================
         st.markdown("#### 📊 Rincian Data Improvement Priority")
-        sun_df_sorted = sun_df[['Priority', 'Count', 'percentage']].sort_values(by='Count', ascending=False)
-        st.dataframe(sun_df_sorted, use_container_width=True)
+        st.dataframe(pd.DataFrame({'Priority': sorted_labels, 'Count': sorted_counts, 'percentage': sorted_pct}, index=order_desc), use_container_width=True)
 
         # insight utama
-        top_priority = sun_df_sorted.iloc[0]['Priority']
-        top_percent = sun_df_sorted.iloc[0]['percentage']
+        top_priority = sorted_labels[0]
+        top_percent = sorted_pct[0]
         st.success(
             f"🔎 Prioritas utama perbaikan adalah **{top_priority}**, dengan jumlah responden terbanyak (**{top_percent}%** dari total responden)."
         )
          # heatmap: priority preference by faculty
         if meta['faculty_cols']:
-            fac_pr_mat = {}
-            for fcol in meta['faculty_cols']:
-                fac = fcol.replace('Fakultas_', '')
-                fac_pr_mat[fac] = []
-                for pcol in pr_cols:
-                    mask = df[fcol] == True
-                    pct = df.loc[mask, pcol].mean() * 100 if mask.sum() > 0 else 0.0
-                    fac_pr_mat[fac].append(pct)
-            fac_pr_df = pd.DataFrame(fac_pr_mat, index=[p.replace('Jika diberikan kesempatan memilih, aspek apa yang paling prioritas untuk diperbaiki pada SIAMIK?_', '') for p in pr_cols])
-            fig3 = px.imshow(fac_pr_df, labels=dict(x="Faculty", y="Priority", color="Percentage"), title="Priority Preferences by Faculty (%)", aspect="auto", color_continuous_scale='YlOrRd')
-            st.plotly_chart(fig3, use_container_width=True)
+            render_faculty_heatmap(df, meta, 'priority', "Priority", "Priority Preferences by Faculty (%)")
         # ======================================================
         # Action Plan (Top 3 Priorities)
         # ======================================================
         st.markdown("---")
         st.subheader("Recommended Action Plan (Top priorities)")
 
-        top3 = sun_df.sort_values('Count', ascending=False).head(3).reset_index(drop=True)
-
-        if not top3.empty:
-            for idx, row in top3.iterrows():
-                name = row['Priority']
-                cnt = int(row['Count'])
-                pct = row['percentage']
+        if len(sorted_labels):
+            for idx, (name, cnt, pct) in enumerate(zip(sorted_labels[:3], sorted_counts[:3], sorted_pct[:3])):
+                cnt = int(cnt)
                 urgency = "🔴 CRITICAL" if idx == 0 else "🟡 HIGH" if idx == 1 else "🟢 MEDIUM"
                 st.markdown(f"{urgency} **{name}** — requested by **{pct:.1f}%** of respondents ({cnt} votes)")
 
                 # rekomendasi tindakan kontekstual
-                if 'kecepatan' in name.lower() or 'server' in name.lower():
-                    st.markdown("- Tingkatkan kapasitas server, optimalkan query, dan tambahkan caching atau CDN.")
-                elif 'notifikasi' in name.lower() or 'notification' in name.lower():
-                    st.markdown("- Implementasi notifikasi real-time (email/SMS/in-app) dan riwayat notifikasi yang lebih jelas.")
-                elif 'proses' in name.lower() or 'approval' in name.lower() or 'acc' in name.lower():
-                    st.markdown("- Sederhanakan alur approval, tambahkan SLA, dan buat pengingat otomatis untuk status pengajuan.")
-                else:
-                    st.markdown("- Lakukan survei kualitatif untuk desain solusi yang lebih tepat, uji coba kecil sebelum penerapan besar.")
+                st.markdown(next((advice for pattern, advice in ACTION_RULES if pattern.search(str(name))), ACTION_DEFAULT))
         else:
             st.info("No top priorities to show.")
 